@@ -1,11 +1,18 @@
+from contextlib import contextmanager
+
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
 
 SQLALCHEMY_DATABASE_URL = "sqlite:///./inventory.db"
 
+# Sized for FastAPI's threadpool: the default 5 + 10 connections runs out under
+# concurrent requests and callers block for pool_timeout seconds.
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL,
     connect_args={"check_same_thread": False},
+    pool_size=20,
+    max_overflow=10,
+    pool_timeout=30,
 )
 
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -18,3 +25,36 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# PRAGMA -> bulk-load value; each connection's previous values are restored afterwards
+_SQLITE_BULK_PRAGMAS = {
+    "synchronous": "OFF",
+    "journal_mode": "MEMORY",
+    "temp_store": "MEMORY",
+}
+
+
+@contextmanager
+def bulk_load_session():
+    """One transaction for offline bulk loads (scripts/); on SQLite, skips fsync and keeps
+    the rollback journal in memory for its duration. Not crash-safe, so never use it in the app."""
+    with engine.connect() as conn:
+        sqlite = conn.dialect.name == "sqlite"
+        previous = {}
+        if sqlite:
+            # Read before changing: journal_mode is stored in the database file (e.g. WAL)
+            for name, fast in _SQLITE_BULK_PRAGMAS.items():
+                previous[name] = conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+                conn.exec_driver_sql(f"PRAGMA {name}={fast}")
+            conn.commit()
+        try:
+            # Loads are write-only: nothing is read back after commit, so don't expire
+            with SessionLocal(bind=conn, expire_on_commit=False) as db, db.begin():
+                yield db
+        finally:
+            if sqlite:
+                conn.rollback()
+                for name, value in previous.items():
+                    conn.exec_driver_sql(f"PRAGMA {name}={value}")
+                conn.commit()
@@ -1,21 +1,25 @@
 """
-Forecasting and restock-date logic using Darts (exponential smoothing).
+Forecasting and restock-date logic using statsmodels (simple exponential smoothing).
 
 Input: daily demand = inventory start of day (AM) - inventory end of day (EOD) = units consumed per day.
 Output: predicted daily demand, total stock needed over horizon, restock date, and confidence interval.
 """
 
-from datetime import datetime, timedelta
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from statistics import NormalDist
 from typing import Optional
 
 import numpy as np
 import pandas as pd
-from darts import TimeSeries
-from darts.models import ExponentialSmoothing
-from darts.utils.utils import ModelMode, SeasonalityMode
+from sqlalchemy import case, func, insert, select
 from sqlalchemy.orm import Session
+from statsmodels.tsa.holtwinters import ExponentialSmoothing, HoltWintersResults
 
-from models import Snapshot, InventoryCount
+from models import Snapshot, InventoryCount, DailyDemand
 
 
 # Minimum days of (AM, EOD) pairs needed to fit the model
@@ -24,17 +28,103 @@ MIN_DAYS_FOR_FORECAST = 2
 # Default forecast horizon (days)
 DEFAULT_HORIZON = 14
 
-# Number of samples for probabilistic forecast (restock-date confidence)
+# Number of samples for probabilistic forecast (restock-date confidence, "sampled" interval)
 NUM_SAMPLES = 500
 
 # Quantiles for restock-date confidence interval (e.g. 0.1, 0.9 => 80% interval)
 RESTOCK_QUANTILE_LOW = 0.1
 RESTOCK_QUANTILE_HIGH = 0.9
 
+# How the restock-date interval is computed: "analytic" (closed-form SES variance),
+# "sampled" (Monte Carlo paths from the model) or None (point forecast only)
+RESTOCK_INTERVAL = "analytic"
 
-def _date_floor(ts: datetime) -> datetime:
-    """Floor timestamp to date (midnight UTC)."""
-    return ts.replace(hour=0, minute=0, second=0, microsecond=0)
+# "analytic" falls back to "sampled" when any day of the point forecast is below this many
+# one-step error SDs: the closed form ignores that each day's demand is clamped at 0,
+# which dominates when the mean is near 0 and the noise large. History with restock days
+# (negative AM - EOD demand, as in the seed scripts' data) is such a case, so it is still
+# forecast with Monte Carlo; the closed form serves steady, restock-free histories.
+ANALYTIC_MIN_MEAN_SD = 2.0
+
+# Standard normal quantiles for (low, median, high) restock days
+_RESTOCK_Z = np.array(
+    [NormalDist().inv_cdf(q) for q in (RESTOCK_QUANTILE_LOW, 0.5, RESTOCK_QUANTILE_HIGH)]
+)
+
+# Fitted models kept in memory (LRU), keyed by the demand values they were fitted on
+MODEL_CACHE_SIZE = 256
+_model_cache: "OrderedDict[bytes, HoltWintersResults]" = OrderedDict()
+_model_cache_lock = threading.Lock()
+
+
+def refresh_daily_demand(
+    db: Session,
+    store_name: Optional[str] = None,
+    day: Optional[date] = None,
+) -> None:
+    """
+    Recompute DailyDemand rows from the raw snapshot counts.
+
+    Scope is one store and day (after a snapshot there is added or edited), a whole store,
+    or the whole table when both are None. Rows in scope are replaced, so a day that lost
+    its AM or EOD snapshot drops out. In each (day, time_of_day) slot, the snapshots at the
+    slot's latest timestamp are summed. Pending ORM changes are flushed first; the caller commits.
+    """
+    db.flush()
+
+    stale = db.query(DailyDemand)
+    if store_name is not None:
+        stale = stale.filter(DailyDemand.store_name == store_name)
+    if day is not None:
+        stale = stale.filter(DailyDemand.date == day)
+    stale.delete(synchronize_session=False)
+
+    # Within each (store, product, day, AM/EOD) slot keep only the snapshots at the latest
+    # timestamp: a batch upload's photos share one timestamp and add up, a later retake
+    # replaces earlier ones (the same rule as latest_eod_counts)
+    snap_day = func.date(Snapshot.timestamp)
+    rank = (
+        func.rank()
+        .over(
+            partition_by=(
+                Snapshot.store_name,
+                InventoryCount.product_type,
+                snap_day,
+                Snapshot.time_of_day,
+            ),
+            order_by=Snapshot.timestamp.desc(),
+        )
+        .label("rank")
+    )
+    slot_q = (
+        select(
+            Snapshot.store_name,
+            InventoryCount.product_type,
+            snap_day.label("day"),
+            Snapshot.time_of_day,
+            InventoryCount.count,
+            rank,
+        )
+        .join_from(InventoryCount, Snapshot, InventoryCount.snapshot_id == Snapshot.id)
+    )
+    if store_name is not None:
+        slot_q = slot_q.where(Snapshot.store_name == store_name)
+    if day is not None:
+        start = datetime(day.year, day.month, day.day)
+        slot_q = slot_q.where(Snapshot.timestamp >= start, Snapshot.timestamp < start + timedelta(days=1))
+    slots = slot_q.subquery()
+
+    am = func.sum(case((slots.c.time_of_day == "AM", slots.c.count)))
+    eod = func.sum(case((slots.c.time_of_day == "EOD", slots.c.count)))
+    rows = (
+        select(slots.c.store_name, slots.c.product_type, slots.c.day, am - eod)
+        .where(slots.c.rank == 1)
+        .group_by(slots.c.store_name, slots.c.product_type, slots.c.day)
+        .having(am.is_not(None), eod.is_not(None))
+    )
+    db.execute(
+        insert(DailyDemand).from_select(["store_name", "product_type", "date", "demand"], rows)
+    )
 
 
 def build_daily_demand_series(
@@ -45,48 +135,36 @@ def build_daily_demand_series(
     """
     Build a univariate daily demand series for one product.
 
-    Demand = AM count - EOD count (units consumed that day). Pairs snapshots by calendar day;
-    each day must have both an AM and an EOD snapshot.
+    Demand = AM count - EOD count (units consumed that day), read from the DailyDemand
+    table (see refresh_daily_demand). With store_name None, stores are summed per day.
 
     Returns a pandas Series with DatetimeIndex (date) and demand values, or None if insufficient data.
     """
     query = (
-        db.query(Snapshot)
-        .filter(
-            Snapshot.id.in_(
-                db.query(InventoryCount.snapshot_id).filter(
-                    InventoryCount.product_type == product_type
-                )
-            )
-        )
-        .order_by(Snapshot.timestamp.asc())
+        db.query(DailyDemand.date, func.sum(DailyDemand.demand))
+        .filter(DailyDemand.product_type == product_type)
+        .group_by(DailyDemand.date)
+        .order_by(DailyDemand.date)
     )
     if store_name is not None:
-        query = query.filter(Snapshot.store_name == store_name)
-    snapshots = query.all()
-
-    # Group counts by snapshot date and time_of_day
-    by_date: dict[datetime, dict[str, int]] = {}
-    for s in snapshots:
-        d = _date_floor(s.timestamp)
-        if d not in by_date:
-            by_date[d] = {}
-        for c in s.counts:
-            if c.product_type != product_type:
-                continue
-            by_date[d][s.time_of_day] = c.count
-
-    # Build daily demand: AM - EOD = consumption
-    rows = []
-    for d, tod_counts in sorted(by_date.items()):
-        if "AM" in tod_counts and "EOD" in tod_counts:
-            demand = tod_counts["AM"] - tod_counts["EOD"]
-            rows.append({"date": d, "demand": demand})
-    if len(rows) < MIN_DAYS_FOR_FORECAST:
+        query = query.filter(DailyDemand.store_name == store_name)
+    rows = query.all()
+    if not rows:
         return None
+    dates, demand = zip(*rows)
+    return _demand_series(dates, demand)
 
-    df = pd.DataFrame(rows).set_index("date").sort_index()
-    return df["demand"]
+
+def _demand_series(dates, demand) -> Optional[pd.Series]:
+    """Daily demand values as a Series on a DatetimeIndex, or None with too few days to fit."""
+    if len(dates) < MIN_DAYS_FOR_FORECAST:
+        return None
+    return pd.Series(
+        demand,
+        index=pd.DatetimeIndex(dates, name="date"),
+        name="demand",
+        dtype="int64",
+    )
 
 
 def get_forecastable_product_types(
@@ -96,17 +174,42 @@ def get_forecastable_product_types(
     """
     Return product types that have at least MIN_DAYS_FOR_FORECAST days of AM+EOD pairs.
     """
-    product_types = (
-        db.query(InventoryCount.product_type)
-        .distinct()
+    query = db.query(DailyDemand.product_type)
+    if store_name is not None:
+        query = query.filter(DailyDemand.store_name == store_name)
+    rows = (
+        query.group_by(DailyDemand.product_type)
+        .having(func.count(func.distinct(DailyDemand.date)) >= MIN_DAYS_FOR_FORECAST)
+        .order_by(DailyDemand.product_type)
         .all()
     )
-    product_types = [p[0] for p in product_types]
-    forecastable = []
-    for pt in product_types:
-        if build_daily_demand_series(db, pt, store_name) is not None:
-            forecastable.append(pt)
-    return sorted(forecastable)
+    return [r[0] for r in rows]
+
+
+def _daily_values(demand_series: pd.Series) -> np.ndarray:
+    """Demand as float64 on a gap-free daily index; missing days count as zero demand."""
+    return demand_series.asfreq("D", fill_value=0).to_numpy(dtype=np.float64)
+
+
+def _fitted_model(y: np.ndarray) -> HoltWintersResults:
+    """
+    Return exponential smoothing fitted on y, reusing a cached fit when the demand values
+    are unchanged since the last forecast.
+    """
+    key = y.tobytes()
+    with _model_cache_lock:
+        results = _model_cache.get(key)
+        if results is not None:
+            _model_cache.move_to_end(key)
+            return results
+
+    results = ExponentialSmoothing(y, trend=None, seasonal=None).fit()
+
+    with _model_cache_lock:
+        _model_cache[key] = results
+        if len(_model_cache) > MODEL_CACHE_SIZE:
+            _model_cache.popitem(last=False)
+    return results
 
 
 def forecast_demand(
@@ -114,32 +217,56 @@ def forecast_demand(
     horizon: int = DEFAULT_HORIZON,
     num_samples: int = 1,
     random_state: Optional[int] = 42,
-) -> tuple[TimeSeries, Optional[TimeSeries]]:
+    rng: Optional[np.random.Generator] = None,
+) -> tuple[np.ndarray, Optional[np.ndarray]]:
     """
     Fit exponential smoothing on daily demand and predict future demand.
 
     Uses univariate exponential smoothing (no trend, no seasonality by default)
-    for stability with short retail series.
+    for stability with short retail series. The fit is cached per series, so repeat
+    forecasts on unchanged data only run predict. Sample paths are drawn in one batch
+    from rng if given, else from a RandomState seeded with random_state.
 
     Returns:
-        - point_forecast: deterministic forecast (or probabilistic if num_samples > 1).
-        - samples_forecast: probabilistic forecast (num_samples paths) if num_samples > 1, else None.
+        - point_forecast: deterministic forecast, shape (horizon,).
+        - samples_forecast: simulated demand paths, shape (horizon, num_samples), if num_samples > 1, else None.
     """
-    ts = TimeSeries.from_series(demand_series, fill_missing_dates=True, fillna_value=0)
-    model = ExponentialSmoothing(
-        trend=ModelMode.NONE,
-        seasonal=SeasonalityMode.NONE,
-        random_state=random_state,
+    results = _fitted_model(_daily_values(demand_series))
+    point_forecast = results.forecast(horizon)
+    if num_samples <= 1:
+        return point_forecast, None
+    return point_forecast, _sample_paths(results, horizon, num_samples, random_state, rng)
+
+
+def _sample_paths(
+    results: HoltWintersResults,
+    horizon: int,
+    num_samples: int,
+    random_state: Optional[int] = 42,
+    rng: Optional[np.random.Generator] = None,
+) -> np.ndarray:
+    """Simulated demand paths from a fit, shape (horizon, num_samples), drawn in one batch."""
+    return results.simulate(
+        horizon,
+        repetitions=num_samples,
+        rng=rng if rng is not None else np.random.RandomState(random_state),
     )
-    model.fit(ts)
 
-    if num_samples <= 1:
-        pred = model.predict(n=horizon, num_samples=1)
-        return pred, None
 
-    pred_point = model.predict(n=horizon, num_samples=1)
-    pred_samples = model.predict(n=horizon, num_samples=num_samples)
-    return pred_point, pred_samples
+def smoothing_error_params(demand_series: pd.Series) -> tuple[float, float]:
+    """
+    Return (alpha, sigma2) for the exponential smoothing fit on demand_series.
+
+    alpha is the smoothing level; sigma2 the one-step residual variance, estimated the same
+    way statsmodels does when it simulates sample paths. Reuses the cached fit.
+    """
+    return _error_params(_fitted_model(_daily_values(demand_series)))
+
+
+def _error_params(results: HoltWintersResults) -> tuple[float, float]:
+    alpha = float(results.params["smoothing_level"])
+    sigma2 = float(results.sse) / max(results.model.nobs - 2, 1)
+    return alpha, sigma2
 
 
 def restock_day_from_path(
@@ -154,52 +281,90 @@ def restock_day_from_path(
     demand_path: 1D array of predicted daily demand (consumption) for each day.
     Returns None if inventory never hits the threshold within the path length.
     """
-    inv = current_inventory
-    for i, d in enumerate(demand_path):
-        inv -= max(0, float(d))  # Clamp demand to >= 0; negative predictions are not meaningful
-        if inv <= safety_stock:
-            return i
-    return None
+    # Clamp demand to >= 0; negative predictions are not meaningful
+    used = np.maximum(np.asarray(demand_path, dtype=np.float64), 0).cumsum()
+    hits = np.flatnonzero(current_inventory - used <= safety_stock)
+    return int(hits[0]) if hits.size else None
 
 
 def restock_date_with_confidence(
     current_inventory: float,
-    samples_forecast: TimeSeries,
+    samples_forecast: np.ndarray,
     start_date: datetime,
     safety_stock: float = 0,
 ) -> dict:
     """
     Compute restock date (median) and confidence interval from probabilistic demand forecast.
 
-    samples_forecast: from model.predict(n=horizon, num_samples=N) (N x horizon).
+    samples_forecast: simulated daily demand, shape (horizon, N), from forecast_demand.
     start_date: first day of forecast (day after last observed).
-    Returns dict with restock_date_median, restock_date_low, restock_date_high, confidence_level, restock_days (all paths).
+    Returns dict with restock_date_median, restock_date_low, restock_date_high, confidence_level,
+    restock_day_* and paths_within_horizon.
     """
-    # (n_components, n_timesteps, n_samples) -> take first component, then (n_timesteps, n_samples)
-    vals = samples_forecast.values()
-    if vals.ndim == 3:
-        # (n_timesteps, n_components, n_samples) in newer Darts
-        demand_matrix = np.squeeze(vals)
-        if demand_matrix.ndim == 3:
-            demand_matrix = demand_matrix[:, 0, :]  # (n_timesteps, n_samples)
-    else:
-        demand_matrix = np.squeeze(vals)  # (n_timesteps,) or (n_timesteps, n_samples)
+    demand_matrix = np.asarray(samples_forecast, dtype=np.float64)
     if demand_matrix.ndim == 1:
         demand_matrix = demand_matrix[:, np.newaxis]
 
     n_days, n_samples = demand_matrix.shape
-    restock_days: list[Optional[int]] = []
-    for s in range(n_samples):
-        path = demand_matrix[:, s]
-        day = restock_day_from_path(current_inventory, path, safety_stock)
-        restock_days.append(day)
-
-    # Replace None with n_days (beyond horizon) for percentile computation
-    days_for_quantile = [d if d is not None else n_days for d in restock_days]
-    days_arr = np.array(days_for_quantile)
-    median_day = float(np.median(days_arr))
-    low_day = float(np.quantile(days_arr, RESTOCK_QUANTILE_LOW))
-    high_day = float(np.quantile(days_arr, RESTOCK_QUANTILE_HIGH))
+
+    # Same scan as restock_day_from_path, run over all sample paths at once:
+    # cumulative (clamped) demand per path, then the first day each path hits the threshold.
+    # inventory - cum <= safety_stock  <=>  cum >= inventory - safety_stock (one scalar, no temp matrix)
+    cum = np.maximum(demand_matrix, 0).cumsum(axis=0)
+    hit_mask = cum >= current_inventory - safety_stock
+    any_hit = hit_mask.any(axis=0)
+    first = hit_mask.argmax(axis=0)
+    # Paths that never hit the threshold count as n_days (beyond horizon) for percentile computation
+    days_arr = np.where(any_hit, first, n_days)
+    # One partition for all three quantiles (0.5 == median)
+    low_day, median_day, high_day = np.quantile(
+        days_arr, [RESTOCK_QUANTILE_LOW, 0.5, RESTOCK_QUANTILE_HIGH]
+    ).tolist()
+    return {
+        **_restock_summary(low_day, median_day, high_day, n_days, start_date),
+        "paths_within_horizon": int(np.count_nonzero(any_hit)),
+    }
+
+
+def restock_date_analytic(
+    current_inventory: float,
+    demand_path: np.ndarray,
+    alpha: float,
+    sigma2: float,
+    start_date: datetime,
+    safety_stock: float = 0,
+) -> dict:
+    """
+    Closed-form counterpart of restock_date_with_confidence for simple exponential smoothing.
+
+    With additive errors, cumulative demand over the first h days is Normal with mean
+    sum(demand_path[:h]) and variance sigma2 * sum_{k<h} (1 + alpha*k)^2. The restock day
+    at quantile q is the first day where inventory - mean + z_q * sd <= safety_stock.
+
+    demand_path: point forecast of daily demand (clamped to >= 0 here).
+    alpha, sigma2: from smoothing_error_params.
+    Returns the same keys as restock_date_with_confidence, without paths_within_horizon.
+    """
+    path = np.maximum(np.asarray(demand_path, dtype=np.float64), 0)
+    n_days = path.shape[0]
+    mean_cum = path.cumsum()
+    sd_cum = np.sqrt(sigma2 * np.cumsum((1 + alpha * np.arange(n_days)) ** 2))
+
+    # (3, n_days): one row per quantile; days that never hit count as n_days
+    hit_mask = current_inventory - mean_cum + _RESTOCK_Z[:, np.newaxis] * sd_cum <= safety_stock
+    days = np.where(hit_mask.any(axis=1), hit_mask.argmax(axis=1), n_days)
+    low_day, median_day, high_day = days.astype(np.float64).tolist()
+    return _restock_summary(low_day, median_day, high_day, n_days, start_date)
+
+
+def _restock_summary(
+    low_day: float,
+    median_day: float,
+    high_day: float,
+    n_days: int,
+    start_date: datetime,
+) -> dict:
+    """Restock days (0-based from start_date) and their dates, capped at the horizon."""
     confidence_level = RESTOCK_QUANTILE_HIGH - RESTOCK_QUANTILE_LOW
 
     def day_to_date(day_float: float) -> str:
@@ -217,8 +382,7 @@ def restock_date_with_confidence(
         "restock_day_median": median_day,
         "restock_day_low": low_day,
         "restock_day_high": high_day,
-    "paths_within_horizon": sum(1 for d in restock_days if d is not None),
-}
+    }
 
 
 def run_forecast_from_series(
@@ -229,27 +393,39 @@ def run_forecast_from_series(
     num_samples: int = NUM_SAMPLES,
     product_type: Optional[str] = None,
     store_name: Optional[str] = None,
+    interval: Optional[str] = RESTOCK_INTERVAL,
+    rng: Optional[np.random.Generator] = None,
 ) -> dict:
     """
     Run the full forecast pipeline from a demand series and current inventory (no DB).
 
     Use this to test forecasting without a database. demand_series should have a
     DatetimeIndex; current_inventory is the on-hand count at the start of the forecast.
+    interval picks how the restock-date interval is computed (see RESTOCK_INTERVAL);
+    "analytic" uses Monte Carlo instead when demand is near 0 relative to its noise, which
+    includes most histories with restock days (see ANALYTIC_MIN_MEAN_SD). The method used is
+    returned as restock_interval. num_samples and rng only apply when sampling.
     """
     if len(demand_series) < MIN_DAYS_FOR_FORECAST:
         raise ValueError(
             f"Need at least {MIN_DAYS_FOR_FORECAST} days of demand data, got {len(demand_series)}"
         )
+    if interval not in ("analytic", "sampled", None):
+        raise ValueError(f"Unknown restock interval method: {interval!r}")
 
-    point_forecast, samples_forecast = forecast_demand(
-        demand_series,
-        horizon=horizon,
-        num_samples=num_samples,
-    )
-    point_values = point_forecast.values().flatten()
+    # One cached fit serves the point forecast, the error params and (if needed) the paths
+    results = _fitted_model(_daily_values(demand_series))
     # Clamp predicted demand to >= 0; negative values are not meaningful for usage
-    predicted_demand_per_day = [max(0, float(x)) for x in point_values]
-    predicted_stock_needed = float(np.sum(predicted_demand_per_day))
+    demand_path = np.maximum(np.asarray(results.forecast(horizon), dtype=np.float64), 0)
+    if interval == "analytic":
+        alpha, sigma2 = _error_params(results)
+        if demand_path.min() < ANALYTIC_MIN_MEAN_SD * np.sqrt(sigma2):
+            interval = "sampled"
+    samples_forecast = None
+    if interval == "sampled" and num_samples > 1:
+        samples_forecast = _sample_paths(results, horizon, num_samples, rng=rng)
+    predicted_demand_per_day = demand_path.tolist()
+    predicted_stock_needed = float(demand_path.sum())
 
     last_date = demand_series.index[-1]
     if isinstance(last_date, pd.Timestamp):
@@ -266,6 +442,10 @@ def run_forecast_from_series(
         "demand_history_days": len(demand_series),
     }
 
+    # Which method produced the interval (None: point forecast only)
+    result["restock_interval"] = "sampled" if samples_forecast is not None else (
+        "analytic" if interval == "analytic" else None
+    )
     if samples_forecast is not None:
         restock = restock_date_with_confidence(
             current_inventory,
@@ -273,6 +453,19 @@ def run_forecast_from_series(
             start_date,
             safety_stock=safety_stock,
         )
+    elif interval == "analytic":
+        restock = restock_date_analytic(
+            current_inventory,
+            demand_path,
+            alpha,
+            sigma2,
+            start_date,
+            safety_stock=safety_stock,
+        )
+    else:
+        restock = None
+
+    if restock is not None:
         result["restock_date_median"] = restock["restock_date_median"]
         result["restock_date_low"] = restock["restock_date_low"]
         result["restock_date_high"] = restock["restock_date_high"]
@@ -281,9 +474,7 @@ def run_forecast_from_series(
         result["restock_day_low"] = restock["restock_day_low"]
         result["restock_day_high"] = restock["restock_day_high"]
     else:
-        day = restock_day_from_path(
-            current_inventory, np.array(predicted_demand_per_day), safety_stock
-        )
+        day = restock_day_from_path(current_inventory, demand_path, safety_stock)
         if day is not None:
             restock_date = (start_date + timedelta(days=day)).date().isoformat()
             result["restock_date_median"] = restock_date
@@ -295,6 +486,45 @@ def run_forecast_from_series(
     return result
 
 
+def latest_eod_counts(
+    db: Session,
+    product_types: list[str],
+    store_name: Optional[str] = None,
+) -> dict[str, float]:
+    """
+    Current on-hand count per product: the sum over all EOD snapshots at the product's latest
+    EOD timestamp in each store (a batch upload stores several photos with one timestamp),
+    matching how DailyDemand sums them. With store_name None, stores are summed like demand.
+    Products with no EOD count are left out.
+    """
+    # rank() gives every snapshot tied at the newest timestamp rank 1
+    rank = (
+        func.rank()
+        .over(
+            partition_by=(InventoryCount.product_type, Snapshot.store_name),
+            order_by=Snapshot.timestamp.desc(),
+        )
+        .label("rank")
+    )
+    eod_q = (
+        db.query(InventoryCount.product_type, InventoryCount.count, rank)
+        .join(Snapshot, InventoryCount.snapshot_id == Snapshot.id)
+        .filter(
+            InventoryCount.product_type.in_(product_types),
+            Snapshot.time_of_day == "EOD",
+        )
+    )
+    if store_name is not None:
+        eod_q = eod_q.filter(Snapshot.store_name == store_name)
+    ranked = eod_q.subquery()
+    rows = (
+        db.query(ranked.c.product_type, func.sum(ranked.c.count))
+        .filter(ranked.c.rank == 1)
+        .group_by(ranked.c.product_type)
+    )
+    return {product_type: float(count) for product_type, count in rows}
+
+
 def run_forecast(
     db: Session,
     product_type: str,
@@ -311,18 +541,7 @@ def run_forecast(
     if demand_series is None or len(demand_series) < MIN_DAYS_FOR_FORECAST:
         return None
 
-    latest_eod_q = (
-        db.query(InventoryCount)
-        .join(Snapshot, InventoryCount.snapshot_id == Snapshot.id)
-        .filter(
-            InventoryCount.product_type == product_type,
-            Snapshot.time_of_day == "EOD",
-        )
-    )
-    if store_name is not None:
-        latest_eod_q = latest_eod_q.filter(Snapshot.store_name == store_name)
-    latest_eod = latest_eod_q.order_by(Snapshot.timestamp.desc()).first()
-    current_inventory = float(latest_eod.count) if latest_eod else 0.0
+    current_inventory = latest_eod_counts(db, [product_type], store_name).get(product_type, 0.0)
 
     return run_forecast_from_series(
         demand_series,
@@ -333,3 +552,72 @@ def run_forecast(
         product_type=product_type,
         store_name=store_name,
     )
+
+
+def run_forecasts_bulk(
+    db: Session,
+    product_types: Optional[list[str]] = None,
+    store_name: Optional[str] = None,
+    horizon: int = DEFAULT_HORIZON,
+    safety_stock: float = 0,
+    limit: Optional[int] = None,
+) -> list[dict]:
+    """
+    run_forecast for many products at once (defaults to every forecastable product).
+
+    Demand history and latest EOD counts for all products are read in two queries; the
+    per-product fits run on a thread pool. Products without enough history are skipped,
+    as are products whose forecast fails (logged). With limit, only the first limit
+    products with enough history are forecast. Results follow the order of product_types.
+    """
+    if product_types is None:
+        product_types = get_forecastable_product_types(db, store_name)
+    if not product_types:
+        return []
+
+    demand_q = (
+        db.query(DailyDemand.product_type, DailyDemand.date, func.sum(DailyDemand.demand))
+        .filter(DailyDemand.product_type.in_(product_types))
+        .group_by(DailyDemand.product_type, DailyDemand.date)
+        .order_by(DailyDemand.product_type, DailyDemand.date)
+    )
+    if store_name is not None:
+        demand_q = demand_q.filter(DailyDemand.store_name == store_name)
+    history: dict[str, tuple[list, list]] = {}
+    for product_type, day, demand in demand_q:
+        dates, values = history.setdefault(product_type, ([], []))
+        dates.append(day)
+        values.append(demand)
+
+    latest_eod = latest_eod_counts(db, product_types, store_name)
+
+    jobs = []
+    for product_type in product_types:
+        demand_series = _demand_series(*history.get(product_type, ((), ())))
+        if demand_series is None:
+            continue
+        jobs.append((product_type, demand_series, latest_eod.get(product_type, 0.0)))
+        if limit is not None and len(jobs) == limit:
+            break
+    if not jobs:
+        return []
+
+    def forecast_one(job: tuple[str, pd.Series, float]) -> Optional[dict]:
+        product_type, demand_series, current_inventory = job
+        try:
+            return run_forecast_from_series(
+                demand_series,
+                current_inventory,
+                horizon=horizon,
+                safety_stock=safety_stock,
+                num_samples=NUM_SAMPLES,
+                product_type=product_type,
+                store_name=store_name,
+            )
+        except Exception as e:
+            # One bad series shouldn't take the other products' forecasts down with it
+            print(f"Forecast failed for {product_type}: {e}")
+            return None
+
+    with ThreadPoolExecutor(max_workers=min(len(jobs), os.cpu_count() or 1)) as pool:
+        return [result for result in pool.map(forecast_one, jobs) if result is not None]
@@ -1,51 +1,50 @@
-import base64
+import asyncio
+import hashlib
 import json
 import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from io import BytesIO
+
+import orjson
+from PIL import Image, ImageOps
 
 from pathlib import Path
 
 from fastapi import FastAPI, Depends, UploadFile, File, Form, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from sqlalchemy.orm import Session
-from sqlalchemy import text 
-from pydantic import BaseModel
-from typing import List, Optional
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import insert, text, update
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from pydantic import BaseModel, TypeAdapter
+from typing import List, Literal, Optional
 from datetime import datetime, date
 from dotenv import load_dotenv
 import google.genai as genai
-from google.genai import types
+from google.genai import errors as genai_errors, types
 
 from database import engine, get_db, SessionLocal, Base
-from models import Store, Snapshot, InventoryCount, GeminiSpend
-from forecast import run_forecast, get_forecastable_product_types
+from models import Store, Snapshot, InventoryCount, GeminiSpend, DailyDemand, GeminiImageCache
+from forecast import (
+    run_forecast,
+    run_forecasts_bulk,
+    get_forecastable_product_types,
+    refresh_daily_demand,
+)
 
 load_dotenv()
 
 app = FastAPI()
 
-# Load prompts from files
-PROMPTS_DIR = os.path.join(os.path.dirname(__file__), "prompts")
-SYSTEM_PROMPT = ""
-USER_PROMPT = ""
-
-
-def load_prompts():
-    """Load system and user prompts from files."""
-    global SYSTEM_PROMPT, USER_PROMPT
-
-    system_prompt_path = os.path.join(PROMPTS_DIR, "system_prompt.txt")
-    user_prompt_path = os.path.join(PROMPTS_DIR, "user_prompt.txt")
-
-    try:
-        with open(system_prompt_path, "r") as f:
-            SYSTEM_PROMPT = f.read().strip()
-        with open(user_prompt_path, "r") as f:
-            USER_PROMPT = f.read().strip()
-        print(f"Loaded prompts from {PROMPTS_DIR}")
-    except FileNotFoundError as e:
-        print(f"Warning: Could not load prompt files: {e}")
-        
+# Prompts are read once at import; a missing file fails startup rather than the first upload
+PROMPTS_DIR = Path(__file__).resolve().parent / "prompts"
+SYSTEM_PROMPT = (PROMPTS_DIR / "system_prompt.txt").read_text().strip()
+USER_PROMPT = (PROMPTS_DIR / "user_prompt.txt").read_text().strip()
+BATCH_SYSTEM_PROMPT = (PROMPTS_DIR / "batch_system_prompt.txt").read_text().strip()
+BATCH_USER_PROMPT = (PROMPTS_DIR / "batch_user_prompt.txt").read_text().strip()
 
 app.add_middleware(
     CORSMiddleware,
@@ -60,19 +59,40 @@ gemini_client = genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
 GEMINI_SPEND_LIMIT = float(os.getenv("GEMINI_SPEND_LIMIT_USD", "250"))
 INPUT_COST_PER_TOKEN = 0.10 / 1_000_000   # $0.10 per 1M input tokens
 OUTPUT_COST_PER_TOKEN = 0.40 / 1_000_000   # $0.40 per 1M output tokens
+# Longest image edge (px) sent to Gemini; larger photos are downscaled first
+IMAGE_MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1024"))
+IMAGE_JPEG_QUALITY = 85
+# Most photos accepted by /snapshots/upload_batch (all go to Gemini in one call)
+MAX_BATCH_IMAGES = 16
+
+# Recently seen image results kept in memory in front of the gemini_image_cache table
+IMAGE_CACHE_SIZE = 256
+_image_cache: "OrderedDict[str, list[dict]]" = OrderedDict()
+_image_cache_lock = threading.Lock()
+
+# Gemini throttling: requests and tokens (input + output) per minute, and the most calls
+# allowed in flight at once
+GEMINI_RPM = int(os.getenv("GEMINI_RPM", "60"))
+GEMINI_TPM = int(os.getenv("GEMINI_TPM", "1000000"))
+GEMINI_MAX_CONCURRENCY = int(os.getenv("GEMINI_MAX_CONCURRENCY", "8"))
+for _name, _value in (("GEMINI_RPM", GEMINI_RPM), ("GEMINI_TPM", GEMINI_TPM), ("GEMINI_MAX_CONCURRENCY", GEMINI_MAX_CONCURRENCY)):
+    if _value < 1:
+        raise ValueError(f"{_name} must be at least 1, got {_value}")
+# Calls slower than this (seconds) count as a sign Gemini is overloaded
+GEMINI_TARGET_LATENCY = float(os.getenv("GEMINI_TARGET_LATENCY_S", "15"))
+
+# Pending spend-recording tasks (see _track_gemini_usage); held so they aren't garbage collected
+_spend_tasks: set[asyncio.Task] = set()
 
 
 @app.on_event("startup")
 def on_startup():
     Base.metadata.create_all(bind=engine)
 
-    # Load prompts from files
-    load_prompts()
-
     # Initialize spend row if it doesn't exist, and optionally reset
     db = SessionLocal()
     try:
-        spend = db.query(GeminiSpend).filter(GeminiSpend.id == 1).first()
+        spend = db.get(GeminiSpend, 1)
         if spend is None:
             db.add(GeminiSpend(id=1, total_usd=0.0, total_input_tokens=0, total_output_tokens=0))
             db.commit()
@@ -119,6 +139,12 @@ def on_startup():
             conn.commit()
             print("Migration: added image_path column to snapshots")
 
+        # Indexes: create_all only builds them with new tables, so add any missing ones
+        for table in (Snapshot.__table__, InventoryCount.__table__):
+            for index in table.indexes:
+                index.create(bind=conn, checkfirst=True)
+        conn.commit()
+
     # Ensure uploads directory exists for snapshot images
     UPLOADS_DIR = Path(__file__).resolve().parent / "uploads"
     UPLOADS_DIR.mkdir(exist_ok=True)
@@ -126,6 +152,16 @@ def on_startup():
     app.state.uploads_dir = UPLOADS_DIR
     app.mount("/uploads", StaticFiles(directory=str(UPLOADS_DIR)), name="uploads")
 
+    # Backfill daily_demand for DBs created before the table existed
+    db = SessionLocal()
+    try:
+        if db.query(DailyDemand.id).first() is None and db.query(Snapshot.id).first() is not None:
+            refresh_daily_demand(db)
+            db.commit()
+            print("Migration: backfilled daily_demand from snapshots")
+    finally:
+        db.close()
+
     # Seed default store if stores table is empty
     db = SessionLocal()
     try:
@@ -137,8 +173,19 @@ def on_startup():
         db.close()
 
 
+@app.on_event("shutdown")
+async def on_shutdown():
+    # Don't drop spend updates for calls that finished just before shutdown
+    if _spend_tasks:
+        await asyncio.gather(*_spend_tasks, return_exceptions=True)
+
+
 @app.get("/health")
-def health():
+def health(db: Session = Depends(get_db)):
+    try:
+        db.execute(text("SELECT 1"))
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=f"Database unavailable: {e}")
     return {"status": "ok"}
 
 
@@ -164,6 +211,15 @@ class SnapshotResponse(BaseModel):
     counts: List[InventoryCountResponse]
 
 
+class SnapshotListItem(BaseModel):
+    id: int
+    timestamp: Optional[str]
+    time_of_day: str
+    store_name: str
+    image_url: Optional[str] = None
+    counts: List[InventoryCountResponse]
+
+
 class ManualCountInput(BaseModel):
     product_type: str
     count: int
@@ -196,6 +252,29 @@ class StoreResponse(BaseModel):
         from_attributes = True
 
 
+class GeminiCountItem(BaseModel):
+    """One product in Gemini's structured output (enforced via response_schema)."""
+    product_type: str
+    count: int
+    confidence_score: Literal["low", "medium", "high"]
+    units: str
+
+
+class GeminiImageCounts(BaseModel):
+    """Counts for one photo in a batched Gemini call."""
+    image_index: int
+    items: List[GeminiCountItem]
+
+
+class SpendResponse(BaseModel):
+    total_usd: float
+    limit_usd: float
+    remaining_usd: float
+    total_input_tokens: int
+    total_output_tokens: int
+    last_updated: Optional[str]
+
+
 # ---------------------------------------------------------------------------
 # Store CRUD
 # ---------------------------------------------------------------------------
@@ -240,6 +319,7 @@ def delete_store(store_id: int, db: Session = Depends(get_db)):
     if snapshot_ids:
         db.query(InventoryCount).filter(InventoryCount.snapshot_id.in_(snapshot_ids)).delete(synchronize_session=False)
         db.query(Snapshot).filter(Snapshot.store_name == store.name).delete(synchronize_session=False)
+        db.query(DailyDemand).filter(DailyDemand.store_name == store.name).delete(synchronize_session=False)
     db.delete(store)
     db.commit()
     return {"status": "deleted", "id": store_id}
@@ -249,9 +329,117 @@ def delete_store(store_id: int, db: Session = Depends(get_db)):
 # Gemini Vision helper (with spend cap)
 # ---------------------------------------------------------------------------
 
+class _RateBucket:
+    """Allowance refilled at per_minute / 60 per second, holding at most burst_seconds' worth."""
+
+    def __init__(self, per_minute: int, burst_seconds: float):
+        self.rate = per_minute / 60
+        self.capacity = max(1.0, self.rate * burst_seconds)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def wait_for(self, amount: float) -> float:
+        """Seconds until the bucket holds amount (0 if it already does)."""
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        return max(0.0, (amount - self.level) / self.rate)
+
+
+class _GeminiThrottle:
+    """
+    Token buckets for requests and tokens per minute plus an AIMD concurrency limit.
+
+    The request bucket holds up to 10 seconds' worth of requests, so bursts are smoothed
+    instead of tripping Gemini's 429s. A call's token use is only known from its response,
+    so it is charged afterwards; the token bucket may go negative and new calls wait until
+    it is paid back. The concurrency limit is halved on 429/503 responses or slow calls and
+    grows by 0.5 after each healthy one, up to max_concurrency.
+    """
+
+    def __init__(self, rpm: int, tpm: int, max_concurrency: int, target_latency: float):
+        self.requests = _RateBucket(rpm, burst_seconds=10)
+        self.tokens = _RateBucket(tpm, burst_seconds=60)
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.in_flight = 0
+        self.target_latency = target_latency
+        self._token_lock = asyncio.Lock()
+        self._slots = asyncio.Condition()
+
+    async def _take_request(self) -> None:
+        async with self._token_lock:  # waiters queue up here in arrival order
+            while True:
+                wait = max(self.requests.wait_for(1), self.tokens.wait_for(0))
+                if wait == 0:
+                    self.requests.level -= 1
+                    return
+                await asyncio.sleep(wait)
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self._slots:
+            await self._slots.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+        try:
+            await self._take_request()
+            yield
+        finally:
+            async with self._slots:
+                self.in_flight -= 1
+                self._slots.notify_all()
+
+    def record(self, latency: Optional[float], tokens: int = 0) -> None:
+        """Adjust the concurrency limit after a call and charge the tokens it used; latency
+        None means it was rejected."""
+        self.tokens.wait_for(0)  # bring the level up to date before charging
+        self.tokens.level -= tokens
+        if latency is None or latency > self.target_latency:
+            self.limit = max(1.0, self.limit * 0.5)
+        else:
+            self.limit = min(float(self.max_concurrency), self.limit + 0.5)
+
+
+_gemini_throttle = _GeminiThrottle(GEMINI_RPM, GEMINI_TPM, GEMINI_MAX_CONCURRENCY, GEMINI_TARGET_LATENCY)
+
+# Static parts of Gemini requests; each call only adds its images.
+# Schemas must be builtin list[Model]: the config coerces typing.List[Model] into an empty Schema.
+COUNT_PROMPT_PART = types.Part.from_text(text=USER_PROMPT)
+COUNT_CONFIG = types.GenerateContentConfig(
+    system_instruction=SYSTEM_PROMPT,
+    response_mime_type="application/json",
+    response_schema=list[GeminiCountItem],
+)
+BATCH_PROMPT_PART = types.Part.from_text(text=BATCH_USER_PROMPT)
+BATCH_CONFIG = types.GenerateContentConfig(
+    system_instruction=BATCH_SYSTEM_PROMPT,
+    response_mime_type="application/json",
+    response_schema=list[GeminiImageCounts],
+)
+
+
+async def _generate_content(contents: list, config: types.GenerateContentConfig):
+    """Call Gemini through the rate/concurrency throttle."""
+    async with _gemini_throttle.slot():
+        start = time.monotonic()
+        try:
+            response = await gemini_client.aio.models.generate_content(
+                model="gemini-2.0-flash",
+                contents=contents,
+                config=config,
+            )
+        except genai_errors.APIError as e:
+            if e.code in (429, 503):
+                _gemini_throttle.record(None)
+            raise
+        tokens = getattr(response.usage_metadata, "total_token_count", None) or 0
+        _gemini_throttle.record(time.monotonic() - start, tokens)
+    return response
+
+
 def _check_spend_limit(db: Session) -> float:
     """Return current spend. Raise 503 if limit is reached."""
-    spend = db.query(GeminiSpend).filter(GeminiSpend.id == 1).first()
+    spend = db.get(GeminiSpend, 1)
     current = spend.total_usd if spend else 0.0
     if current >= GEMINI_SPEND_LIMIT:
         raise HTTPException(
@@ -261,117 +449,217 @@ def _check_spend_limit(db: Session) -> float:
     return current
 
 
-def _record_spend(db: Session, input_tokens: int, output_tokens: int) -> float:
-    """Calculate cost, update the spend tracker, return the call cost."""
+def _record_spend(db: Session, input_tokens: int, output_tokens: int) -> tuple[float, float]:
+    """Calculate cost, update the spend tracker, return (call cost, new total)."""
     cost = (input_tokens * INPUT_COST_PER_TOKEN) + (output_tokens * OUTPUT_COST_PER_TOKEN)
-    spend = db.query(GeminiSpend).filter(GeminiSpend.id == 1).first()
-    spend.total_usd += cost
-    spend.total_input_tokens += input_tokens
-    spend.total_output_tokens += output_tokens
-    spend.last_updated = datetime.utcnow()
+    # Increment in SQL so concurrent uploads can't overwrite each other's totals
+    total = db.execute(
+        update(GeminiSpend)
+        .where(GeminiSpend.id == 1)
+        .values(
+            total_usd=GeminiSpend.total_usd + cost,
+            total_input_tokens=GeminiSpend.total_input_tokens + input_tokens,
+            total_output_tokens=GeminiSpend.total_output_tokens + output_tokens,
+            last_updated=datetime.utcnow(),
+        )
+        .returning(GeminiSpend.total_usd)
+    ).scalar_one()
     db.commit()
-    return cost
+    return cost, total
+
+
+def _preprocess_image(image_bytes: bytes, mime_type: str) -> tuple[bytes, str]:
+    """
+    Downscale an image to IMAGE_MAX_EDGE and re-encode as JPEG for Gemini.
+
+    Vision tokens scale with pixel count, so full-size phone photos cost far more than
+    needed to count products. Small JPEGs and images Pillow can't read are passed through.
+    """
+    try:
+        img = Image.open(BytesIO(image_bytes))
+        if max(img.size) <= IMAGE_MAX_EDGE and img.format == "JPEG":
+            return image_bytes, mime_type
+        img = ImageOps.exif_transpose(img)  # thumbnail drops EXIF, so apply rotation first
+        img.thumbnail((IMAGE_MAX_EDGE, IMAGE_MAX_EDGE), Image.LANCZOS)
+        buf = BytesIO()
+        img.convert("RGB").save(buf, "JPEG", quality=IMAGE_JPEG_QUALITY, optimize=True)
+    except Exception as e:
+        print(f"Image preprocessing skipped: {e}")
+        return image_bytes, mime_type
+    return buf.getvalue(), "image/jpeg"
+
+
+def _image_cache_key(image_bytes: bytes) -> str:
+    """Hash of an image plus all counting prompts (single and batch uploads share entries),
+    so editing any prompt invalidates cached answers."""
+    h = hashlib.blake2b(digest_size=16)
+    h.update(SYSTEM_PROMPT.encode())
+    h.update(USER_PROMPT.encode())
+    h.update(BATCH_SYSTEM_PROMPT.encode())
+    h.update(BATCH_USER_PROMPT.encode())
+    h.update(image_bytes)
+    return h.hexdigest()
+
+
+def _cached_counts(db: Session, key: str) -> Optional[list[dict]]:
+    """Counts previously returned for this image, from memory or the gemini_image_cache table."""
+    with _image_cache_lock:
+        items = _image_cache.get(key)
+        if items is not None:
+            _image_cache.move_to_end(key)
+    if items is None:
+        row = db.get(GeminiImageCache, key)
+        if row is None:
+            return None
+        items = orjson.loads(row.response_json)
+        _remember_counts(key, items)
+    return [dict(item) for item in items]
+
+
+def _store_counts(db: Session, entries: dict[str, list[dict]]) -> None:
+    """Cache counts per image key; the rows are committed with the caller's transaction.
+
+    Concurrent uploads of the same photo can both miss the cache; the later insert is a no-op."""
+    db.execute(
+        sqlite_insert(GeminiImageCache).on_conflict_do_nothing(index_elements=[GeminiImageCache.hash]),
+        [{"hash": key, "response_json": orjson.dumps(items).decode()} for key, items in entries.items()],
+    )
+
+
+def _remember_counts(key: str, items: list[dict]) -> None:
+    with _image_cache_lock:
+        _image_cache[key] = items
+        _image_cache.move_to_end(key)
+        if len(_image_cache) > IMAGE_CACHE_SIZE:
+            _image_cache.popitem(last=False)
+
+
+async def count_products_from_image(
+    image_bytes: bytes, mime_type: str, db: Session
+) -> tuple[list[dict], Optional[str]]:
+    """
+    Send an image to Gemini Vision and return structured product counts.
 
+    Also returns the cache key to store fresh counts under, or None when they came from the
+    cache; _save_uploaded_snapshots writes the cache row with the snapshot.
+    """
+    # Identical images (retries, re-uploads) reuse the earlier answer without calling Gemini
+    cache_key = _image_cache_key(image_bytes)
+    cached = _cached_counts(db, cache_key)
+    if cached is not None:
+        print(f"Gemini cache hit for image {cache_key}")
+        return cached, None
 
-async def count_products_from_image(image_bytes: bytes, mime_type: str, db: Session) -> list[dict]:
-    """Send an image to Gemini Vision and return structured product counts."""
     # Check spend before calling
     _check_spend_limit(db)
 
-    b64_data = base64.b64encode(image_bytes).decode("utf-8")
+    # Use system_instruction in config for system prompt, user prompt in contents.
+    # The async client keeps the event loop free while Gemini works, and the SDK sends
+    # the raw image bytes itself (no base64 copy here).
+    response = await _generate_content(
+        [types.Part.from_bytes(data=image_bytes, mime_type=mime_type), COUNT_PROMPT_PART],
+        COUNT_CONFIG,
+    )
 
-    # Use system_instruction in config for system prompt, user prompt in contents
-    response = gemini_client.models.generate_content(
-        model="gemini-2.0-flash",
-        contents=[
-            {
-                "parts": [
-                    {"inline_data": {"mime_type": mime_type, "data": b64_data}},
-                    {"text": USER_PROMPT},
-                ]
-            }
+    _track_gemini_usage(response)
+    print(f"Gemini raw response: {response.text}")
+    return _normalize_items(_parsed_response(response, list[GeminiCountItem])), cache_key
+
+
+async def count_products_from_images(
+    images: list[tuple[bytes, str]], db: Session
+) -> tuple[list[list[dict]], list[Optional[str]]]:
+    """
+    Send several images to Gemini Vision in one call and return product counts per image.
+
+    images is a list of (image_bytes, mime_type); the result has one list of counts for
+    each, in the same order. Photos Gemini leaves out of its answer get no counts.
+    Images already in the cache are answered from it and left out of the request; the
+    second list holds each image's cache key for fresh counts (None for cache hits).
+    """
+    cache_keys = [_image_cache_key(b) for b, _ in images]
+    per_image: list[list[dict]] = []
+    fresh_keys: list[Optional[str]] = [None] * len(images)
+    # One request slot per distinct uncached image; a repeated photo is sent (and billed) once
+    misses: dict[str, list[int]] = {}
+    for i, key in enumerate(cache_keys):
+        cached = _cached_counts(db, key)
+        per_image.append(cached or [])
+        if cached is None:
+            misses.setdefault(key, []).append(i)
+    if not misses:
+        return per_image, fresh_keys
+
+    _check_spend_limit(db)
+
+    sent = list(misses.values())
+    response = await _generate_content(
+        [
+            *(types.Part.from_bytes(data=images[idx[0]][0], mime_type=images[idx[0]][1]) for idx in sent),
+            BATCH_PROMPT_PART,
         ],
-        config=types.GenerateContentConfig(
-            system_instruction=SYSTEM_PROMPT,
-        ),
+        BATCH_CONFIG,
     )
 
-    # Track spend from usage metadata
+    _track_gemini_usage(response)
+    print(f"Gemini raw response: {response.text}")
+
+    # image_index counts only the images sent in this request
+    for entry in _parsed_response(response, list[GeminiImageCounts]):
+        if 0 <= entry.image_index < len(sent):
+            indices = sent[entry.image_index]
+            counts = _normalize_items(entry.items)
+            for i in indices:
+                per_image[i] = counts
+                fresh_keys[i] = cache_keys[i]
+    return per_image, fresh_keys
+
+
+def _track_gemini_usage(response) -> None:
+    """
+    Record token spend from a Gemini response's usage metadata.
+
+    The UPDATE + commit runs as a background task in its own session, so it stays off the
+    upload's critical path but still happens if the request fails afterwards.
+    """
     usage = response.usage_metadata
     if usage:
         input_tokens = getattr(usage, "prompt_token_count", None) or getattr(usage, "input_token_count", 0) or 0
         output_tokens = getattr(usage, "candidates_token_count", None) or getattr(usage, "output_token_count", 0) or 0
-        cost = _record_spend(db, input_tokens, output_tokens)
-        spend = db.query(GeminiSpend).filter(GeminiSpend.id == 1).first()
-        print(f"Gemini call: {input_tokens} in / {output_tokens} out = ${cost:.6f} (total: ${spend.total_usd:.4f})")
+        task = asyncio.create_task(asyncio.to_thread(_record_spend_later, input_tokens, output_tokens))
+        _spend_tasks.add(task)
+        task.add_done_callback(_spend_tasks.discard)
     else:
         print("WARNING: Gemini response missing usage_metadata — spend not tracked for this call")
 
-    text = response.text.strip()
-    # Strip markdown code fences if Gemini wraps the response
-    if text.startswith("```"):
-        text = text.split("\n", 1)[1]
-        text = text.rsplit("```", 1)[0]
-
-    raw_items = json.loads(text)
-    print(f"Gemini raw response: {raw_items}")
-
-    # Normalize keys — Gemini may use "product", "item", "name", etc.
-    KNOWN_PRODUCT_KEYS = ("product_type", "product", "item", "name", "type", "label")
-    KNOWN_COUNT_KEYS = ("count", "quantity", "number", "amount", "total")
-    KNOWN_CONFIDENCE_KEYS = ("confidence_score", "confidence", "accuracy", "certainty")
-    KNOWN_UNITS_KEYS = ("units", "unit", "measurement", "measurement_unit")
-
-    normalized = []
-    for item in raw_items:
-        # Try known keys first
-        product = next(
-            (v for k in KNOWN_PRODUCT_KEYS
-             if (v := item.get(k)) is not None and v != ""),
-            None,
-        )
-        count = next(
-            (v for k in KNOWN_COUNT_KEYS
-             if (v := item.get(k)) is not None),
-            None,
-        )
 
-        # Extract optional new fields with defaults (backward compatible)
-        confidence = next(
-            (v for k in KNOWN_CONFIDENCE_KEYS
-             if (v := item.get(k)) is not None and v != ""),
-            "medium",  # Default if not provided
-        )
-        unit = next(
-            (v for k in KNOWN_UNITS_KEYS
-             if (v := item.get(k)) is not None and v != ""),
-            "units",  # Default if not provided
-        )
+def _record_spend_later(input_tokens: int, output_tokens: int) -> None:
+    db = SessionLocal()
+    try:
+        cost, total = _record_spend(db, input_tokens, output_tokens)
+    finally:
+        db.close()
+    print(f"Gemini call: {input_tokens} in / {output_tokens} out = ${cost:.6f} (total: ${total:.4f})")
+
 
-        # Fallback: Gemini sometimes returns {"product_name": count_value} with
-        # the product as the key and the count as the value (single-entry dicts
-        # or dicts where no known key matched).
-        if product is None and count is None and len(item) >= 1:
-            for k, v in item.items():
-                if k not in KNOWN_PRODUCT_KEYS and k not in KNOWN_COUNT_KEYS:
-                    try:
-                        count = int(v)
-                        product = k
-                        break
-                    except (ValueError, TypeError):
-                        continue
-
-        # Validate confidence_score (must be low, medium, or high)
-        confidence_str = str(confidence).lower()
-        if confidence_str not in ("low", "medium", "high"):
-            confidence_str = "medium"
-
-        normalized.append({
-            "product_type": str(product or "unknown").lower().replace(" ", "_"),
-            "count": int(count or 0),
-            "confidence_score": confidence_str,
-            "units": str(unit or "units").lower().replace(" ", "_"),
-        })
+def _parsed_response(response, response_schema):
+    """Gemini's structured output as response_schema objects; validates the text if the SDK didn't."""
+    if response.parsed is not None:
+        return response.parsed
+    return TypeAdapter(response_schema).validate_json(response.text)
+
+
+def _normalize_items(items: List[GeminiCountItem]) -> list[dict]:
+    """Turn Gemini's items into count dicts with snake_case product names and units."""
+    normalized = [
+        {
+            "product_type": item.product_type.strip().lower().replace(" ", "_") or "unknown",
+            "count": item.count,
+            "confidence_score": item.confidence_score,
+            "units": item.units.strip().lower().replace(" ", "_") or "units",
+        }
+        for item in items
+    ]
 
     # Print scan results to terminal
     print("\n" + "="*80)
@@ -390,10 +678,10 @@ async def count_products_from_image(image_bytes: bytes, mime_type: str, db: Sess
 # Endpoints
 # ---------------------------------------------------------------------------
 
-@app.get("/spend")
+@app.get("/spend", response_model=SpendResponse)
 def get_spend(db: Session = Depends(get_db)):
     """Check current Gemini API spend vs limit."""
-    spend = db.query(GeminiSpend).filter(GeminiSpend.id == 1).first()
+    spend = db.get(GeminiSpend, 1)
     return {
         "total_usd": round(spend.total_usd, 6) if spend else 0.0,
         "limit_usd": GEMINI_SPEND_LIMIT,
@@ -404,12 +692,24 @@ def get_spend(db: Session = Depends(get_db)):
     }
 
 
-@app.get("/snapshots")
+@app.get("/snapshots", response_model=List[SnapshotListItem])
 def list_snapshots(
     store_name: Optional[str] = Query(None),
     db: Session = Depends(get_db),
 ):
-    query = db.query(Snapshot).order_by(Snapshot.timestamp.desc())
+    # Load all counts for the page in one IN (...) query instead of one lazy load per snapshot
+    query = (
+        db.query(Snapshot)
+        .options(
+            selectinload(Snapshot.counts).load_only(
+                InventoryCount.product_type,
+                InventoryCount.count,
+                InventoryCount.confidence_score,
+                InventoryCount.units,
+            )
+        )
+        .order_by(Snapshot.timestamp.desc())
+    )
     if store_name:
         query = query.filter(Snapshot.store_name == store_name)
     snapshots = query.limit(20).all()
@@ -479,76 +779,176 @@ async def upload_snapshot(
     if not file.content_type or not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="Uploaded file must be an image")
 
-    # Determine timestamp from snapshot_date or fallback to now
-    if snapshot_date:
-        try:
-            parsed_date = date.fromisoformat(snapshot_date)
-        except ValueError:
-            raise HTTPException(status_code=400, detail="snapshot_date must be YYYY-MM-DD")
-        hour = 8 if time_of_day == "AM" else 17
-        timestamp = datetime(parsed_date.year, parsed_date.month, parsed_date.day, hour, 0, 0)
-    else:
-        timestamp = datetime.utcnow()
+    timestamp = _snapshot_timestamp(time_of_day, snapshot_date)
 
     image_bytes = await file.read()
+    # Resize off the event loop; the original image is still what gets saved to disk
+    gemini_bytes, gemini_mime = await asyncio.to_thread(
+        _preprocess_image, image_bytes, file.content_type
+    )
 
     try:
-        product_counts = await count_products_from_image(image_bytes, file.content_type, db)
+        product_counts, cache_key = await count_products_from_image(gemini_bytes, gemini_mime, db)
     except HTTPException:
         raise  # re-raise spend limit 503 as-is
     except (json.JSONDecodeError, Exception) as e:
         raise HTTPException(status_code=502, detail=f"Gemini parsing failed: {e}")
 
-    snapshot = Snapshot(
-        time_of_day=time_of_day,
-        store_name=store_name,
-        timestamp=timestamp,
+    # Writes (DB + image file) block, so run them off the event loop
+    [response] = await asyncio.to_thread(
+        _save_uploaded_snapshots,
+        db,
+        time_of_day,
+        store_name,
+        timestamp,
+        [(image_bytes, file.content_type, product_counts, cache_key)],
     )
-    db.add(snapshot)
+    return response
+
+
+@app.post("/snapshots/upload_batch", response_model=List[SnapshotResponse])
+async def upload_snapshots_batch(
+    files: List[UploadFile] = File(...),
+    time_of_day: str = Form(...),
+    store_name: str = Form("default"),
+    snapshot_date: Optional[str] = Form(None),
+    db: Session = Depends(get_db),
+):
+    """
+    Upload several shelf photos at once. Gemini counts all of them in a single call and
+    each photo becomes its own snapshot (same store, time of day and date).
+    """
+    if time_of_day not in ("AM", "EOD"):
+        raise HTTPException(status_code=400, detail="time_of_day must be 'AM' or 'EOD'")
+    if not db.query(Store).filter(Store.name == store_name).first():
+        raise HTTPException(status_code=400, detail="Store not found. Add the store first.")
+    if len(files) > MAX_BATCH_IMAGES:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_IMAGES} images per batch")
+    if any(not f.content_type or not f.content_type.startswith("image/") for f in files):
+        raise HTTPException(status_code=400, detail="Uploaded files must be images")
+
+    timestamp = _snapshot_timestamp(time_of_day, snapshot_date)
+
+    images = [await f.read() for f in files]
+    gemini_images = await asyncio.gather(*(
+        asyncio.to_thread(_preprocess_image, image_bytes, f.content_type)
+        for image_bytes, f in zip(images, files)
+    ))
+
+    try:
+        per_image_counts, cache_keys = await count_products_from_images(gemini_images, db)
+    except HTTPException:
+        raise  # re-raise spend limit 503 as-is
+    except (json.JSONDecodeError, Exception) as e:
+        raise HTTPException(status_code=502, detail=f"Gemini parsing failed: {e}")
+
+    return await asyncio.to_thread(
+        _save_uploaded_snapshots,
+        db,
+        time_of_day,
+        store_name,
+        timestamp,
+        [
+            (image_bytes, f.content_type, product_counts, cache_key)
+            for image_bytes, f, product_counts, cache_key in zip(images, files, per_image_counts, cache_keys)
+        ],
+    )
+
+
+def _save_uploaded_snapshots(
+    db: Session,
+    time_of_day: str,
+    store_name: str,
+    timestamp: datetime,
+    uploads: list[tuple[bytes, Optional[str], list[dict], Optional[str]]],
+) -> List[SnapshotResponse]:
+    """
+    Create one snapshot per uploaded (image_bytes, content_type, product_counts, cache_key),
+    save the images and insert their counts, all in one transaction. Counts with a cache_key
+    are fresh from Gemini and get their cache row in the same transaction. Blocking; called
+    via to_thread.
+    """
+    snapshots = [
+        Snapshot(time_of_day=time_of_day, store_name=store_name, timestamp=timestamp)
+        for _ in uploads
+    ]
+    db.add_all(snapshots)
     db.flush()
 
-    # Save uploaded image to disk
-    ct = (file.content_type or "").lower()
+    all_rows = []
+    per_snapshot_rows = []
+    fresh_counts: dict[str, list[dict]] = {}
+    for snapshot, (image_bytes, content_type, product_counts, cache_key) in zip(snapshots, uploads):
+        _save_snapshot_image(snapshot, image_bytes, content_type)
+        rows = _gemini_count_rows(snapshot, product_counts)
+        per_snapshot_rows.append(rows)
+        all_rows.extend(rows)
+        if cache_key is not None:
+            fresh_counts[cache_key] = product_counts
+    # One multi-row INSERT for all counts; the response is built from the same rows
+    if all_rows:
+        db.execute(insert(InventoryCount), all_rows)
+    if fresh_counts:
+        _store_counts(db, fresh_counts)
+    refresh_daily_demand(db, store_name, timestamp.date())
+
+    db.commit()
+    for key, items in fresh_counts.items():
+        _remember_counts(key, [dict(item) for item in items])
+
+    return [
+        SnapshotResponse(
+            snapshot_id=snapshot.id,
+            timestamp=snapshot.timestamp.isoformat(),
+            time_of_day=snapshot.time_of_day,
+            store_name=snapshot.store_name,
+            counts=[InventoryCountResponse(**row) for row in rows],
+        )
+        for snapshot, rows in zip(snapshots, per_snapshot_rows)
+    ]
+
+
+def _snapshot_timestamp(time_of_day: str, snapshot_date: Optional[str]) -> datetime:
+    """Timestamp for an uploaded snapshot: 8:00 / 17:00 on snapshot_date, or now."""
+    if not snapshot_date:
+        return datetime.utcnow()
+    try:
+        parsed_date = date.fromisoformat(snapshot_date)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="snapshot_date must be YYYY-MM-DD")
+    hour = 8 if time_of_day == "AM" else 17
+    return datetime(parsed_date.year, parsed_date.month, parsed_date.day, hour, 0, 0)
+
+
+def _save_snapshot_image(snapshot: Snapshot, image_bytes: bytes, content_type: Optional[str]) -> None:
+    """Write an uploaded image under uploads/snapshots and point the snapshot at it."""
+    ct = (content_type or "").lower()
     ext = ".webp" if "webp" in ct else (".png" if "png" in ct else ".jpg")
     uploads_dir = getattr(app.state, "uploads_dir", Path(__file__).resolve().parent / "uploads")
     snap_dir = uploads_dir / "snapshots"
     snap_dir.mkdir(parents=True, exist_ok=True)
     image_filename = f"{snapshot.id}{ext}"
     image_path = snap_dir / image_filename
-    with open(image_path, "wb") as f:
-        f.write(image_bytes)
+    # Write then rename: replaces rather than rewrites any existing file, which may be
+    # a hardlink to a shared asset (scripts/demo_data.py links the demo image in)
+    tmp_path = image_path.with_name(image_filename + ".tmp")
+    tmp_path.write_bytes(image_bytes)
+    os.replace(tmp_path, image_path)
     snapshot.image_path = f"snapshots/{image_filename}"
-    db.flush()
-
-    counts = []
-    for item in product_counts:
-        ic = InventoryCount(
-            snapshot_id=snapshot.id,
-            product_type=item["product_type"],
-            count=item["count"],
-            confidence_score=item.get("confidence_score", "medium"),
-            units=item.get("units", "units"),
-        )
-        db.add(ic)
-        counts.append(ic)
 
-    db.commit()
 
-    return SnapshotResponse(
-        snapshot_id=snapshot.id,
-        timestamp=snapshot.timestamp.isoformat(),
-        time_of_day=snapshot.time_of_day,
-        store_name=snapshot.store_name,
-        counts=[
-            InventoryCountResponse(
-                product_type=c.product_type,
-                count=c.count,
-                confidence_score=c.confidence_score,
-                units=c.units,
-            )
-            for c in counts
-        ],
-    )
+def _gemini_count_rows(snapshot: Snapshot, product_counts: list[dict]) -> list[dict]:
+    """InventoryCount rows for a snapshot from normalized Gemini counts."""
+    return [
+        {
+            "snapshot_id": snapshot.id,
+            "product_type": item["product_type"],
+            "count": item["count"],
+            "confidence_score": item.get("confidence_score", "medium"),
+            "units": item.get("units", "units"),
+        }
+        for item in product_counts
+    ]
 
 
 @app.post("/snapshots/manual", response_model=SnapshotResponse)
@@ -570,17 +970,20 @@ def create_manual_snapshot(
     db.add(snapshot)
     db.flush()
 
-    counts = []
-    for item in data.counts:
-        ic = InventoryCount(
-            snapshot_id=snapshot.id,
-            product_type=item.product_type,
-            count=item.count,
-            confidence_score=item.confidence_score or "medium",
-            units=item.units or "units",
-        )
-        db.add(ic)
-        counts.append(ic)
+    # One multi-row INSERT for all counts; the response is built from the same rows
+    rows = [
+        {
+            "snapshot_id": snapshot.id,
+            "product_type": item.product_type,
+            "count": item.count,
+            "confidence_score": item.confidence_score or "medium",
+            "units": item.units or "units",
+        }
+        for item in data.counts
+    ]
+    if rows:
+        db.execute(insert(InventoryCount), rows)
+    refresh_daily_demand(db, snapshot.store_name, snapshot.timestamp.date())
 
     db.commit()
 
@@ -589,15 +992,7 @@ def create_manual_snapshot(
         timestamp=snapshot.timestamp.isoformat(),
         time_of_day=snapshot.time_of_day,
         store_name=snapshot.store_name,
-        counts=[
-            InventoryCountResponse(
-                product_type=c.product_type,
-                count=c.count,
-                confidence_score=c.confidence_score,
-                units=c.units,
-            )
-            for c in counts
-        ],
+        counts=[InventoryCountResponse(**row) for row in rows],
     )
 
 
@@ -612,28 +1007,36 @@ def edit_snapshot_counts(
     if not snapshot:
         raise HTTPException(status_code=404, detail="Snapshot not found")
 
-    for update in updates:
-        existing = (
-            db.query(InventoryCount)
-            .filter_by(snapshot_id=snapshot_id, product_type=update.product_type)
-            .first()
-        )
+    # Load the snapshot's counts once instead of one lookup per update
+    by_product: dict[str, InventoryCount] = {}
+    for ic in (
+        db.query(InventoryCount)
+        .filter(InventoryCount.snapshot_id == snapshot_id)
+        .order_by(InventoryCount.id)
+    ):
+        by_product.setdefault(ic.product_type, ic)
+
+    for edit in updates:
+        existing = by_product.get(edit.product_type)
         if existing:
-            existing.count = update.count
+            existing.count = edit.count
             # Update optional fields if provided
-            if update.confidence_score is not None:
-                existing.confidence_score = update.confidence_score
-            if update.units is not None:
-                existing.units = update.units
+            if edit.confidence_score is not None:
+                existing.confidence_score = edit.confidence_score
+            if edit.units is not None:
+                existing.units = edit.units
         else:
-            db.add(InventoryCount(
+            ic = InventoryCount(
                 snapshot_id=snapshot_id,
-                product_type=update.product_type,
-                count=update.count,
-                confidence_score=update.confidence_score or "medium",
-                units=update.units or "units",
-            ))
+                product_type=edit.product_type,
+                count=edit.count,
+                confidence_score=edit.confidence_score or "medium",
+                units=edit.units or "units",
+            )
+            db.add(ic)
+            by_product[edit.product_type] = ic
 
+    refresh_daily_demand(db, snapshot.store_name, snapshot.timestamp.date())
     db.commit()
     return {"status": "updated", "snapshot_id": snapshot_id}
 
@@ -651,6 +1054,32 @@ def list_forecastable_products(
     return {"product_types": get_forecastable_product_types(db, store_name)}
 
 
+@app.get("/forecast/all")
+def get_all_forecasts(
+    product_type: Optional[List[str]] = Query(None, description="Products to forecast (default: all forecastable)"),
+    store_name: Optional[str] = Query(None),
+    horizon: int = Query(14, ge=1, le=90),
+    safety_stock: float = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1, description="Forecast at most this many products"),
+    db: Session = Depends(get_db),
+):
+    """
+    Forecast every product in one request (same fields as /forecast, one entry per product).
+
+    Products without enough AM+EOD history, or whose forecast fails, are left out rather
+    than failing the request.
+    """
+    forecasts = run_forecasts_bulk(
+        db,
+        product_types=product_type,
+        store_name=store_name,
+        horizon=horizon,
+        safety_stock=safety_stock,
+        limit=limit,
+    )
+    return {"forecasts": forecasts}
+
+
 @app.get("/forecast")
 def get_forecast(
     product_type: str = Query(..., description="Product type to forecast"),
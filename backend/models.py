@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, Float, String, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, Float, String, Text, Date, DateTime, ForeignKey, Index, UniqueConstraint
 from sqlalchemy.orm import relationship
 from datetime import datetime
 
@@ -23,6 +23,13 @@ class Snapshot(Base):
 
     counts = relationship("InventoryCount", back_populates="snapshot")
 
+    __table_args__ = (
+        # Latest-snapshot lookups filter by store + time_of_day and order by timestamp
+        Index("ix_snap_store_tod_ts", "store_name", "time_of_day", "timestamp"),
+        # /snapshots lists a store's most recent snapshots
+        Index("ix_snapshots_store_ts", "store_name", "timestamp"),
+    )
+
 
 class InventoryCount(Base):
     __tablename__ = "inventory_counts"
@@ -37,6 +44,29 @@ class InventoryCount(Base):
 
     snapshot = relationship("Snapshot", back_populates="counts")
 
+    __table_args__ = (
+        # Forecast queries filter by product_type, then join back to snapshots
+        Index("ix_ic_product_snapshot", "product_type", "snapshot_id"),
+        # Loading a snapshot's counts (edits, selectinload in /snapshots) filters by snapshot_id
+        Index("ix_ic_snap_prod", "snapshot_id", "product_type"),
+    )
+
+
+class DailyDemand(Base):
+    """AM - EOD per product, store and day; derived from snapshots and kept in sync on write."""
+    __tablename__ = "daily_demand"
+
+    id = Column(Integer, primary_key=True, index=True)
+    store_name = Column(String, nullable=False)
+    product_type = Column(String, nullable=False)
+    date = Column(Date, nullable=False)
+    demand = Column(Integer, nullable=False)
+
+    __table_args__ = (
+        # One row per product/store/day; also serves the per-product range scan in forecasts
+        UniqueConstraint("product_type", "store_name", "date", name="uq_daily_demand_product_store_date"),
+    )
+
 
 class GeminiSpend(Base):
     __tablename__ = "gemini_spend"
@@ -46,3 +76,12 @@ class GeminiSpend(Base):
     total_input_tokens = Column(Integer, nullable=False, default=0)
     total_output_tokens = Column(Integer, nullable=False, default=0)
     last_updated = Column(DateTime, default=datetime.utcnow)
+
+
+class GeminiImageCache(Base):
+    """Normalized Gemini counts per image, so re-uploading the same photo skips the API call."""
+    __tablename__ = "gemini_image_cache"
+
+    hash = Column(String, primary_key=True)  # see main._image_cache_key
+    response_json = Column(Text, nullable=False)  # JSON list of normalized counts
+    created_at = Column(DateTime, default=datetime.utcnow)
@@ -4,37 +4,50 @@ Generate demo data for a given store to power the Inventory countdown and
 Suggested reorder tiles. Also sets the snapshot feed image to magic-shelf.png.
 
 Usage (run from backend directory, with venv activated if needed):
-    python3 scripts/demo_data.py [store_name]
+    python3 scripts/demo_data.py [store_name] [--seed N | --random]
 
 Examples:
     python3 scripts/demo_data.py default
     python3 scripts/demo_data.py "My Store"
+    python3 scripts/demo_data.py default --random
 
 If no store name is given, uses "default". Creates the store if it doesn't exist.
 Clears existing snapshots for that store before generating new data.
+The same --seed always produces the same data; --random picks (and prints) a new one.
 
 Make sure to select the same store in the app sidebar to see the demo data.
 """
 import argparse
-import random
+import os
 import shutil
 import sys
-import time
-from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 # Run from backend so imports work
 sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
 
-from database import engine, SessionLocal, Base
-from models import Store, Snapshot, InventoryCount
+import numpy as np
+from sqlalchemy import update
+
+from database import SessionLocal, bulk_load_session
+from models import Snapshot
+from forecast import refresh_daily_demand
+from seed_common import (
+    add_seed_arguments,
+    ensure_schema,
+    insert_snapshots,
+    product_rng,
+    reset_store,
+    resolve_seed,
+    simulate_counts,
+)
 
 # Path to demo image (relative to project root)
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 MAGIC_SHELF_PATH = PROJECT_ROOT / "resources" / "demo" / "magic-shelf.png"
 
 # Grocery products for demo; each assigned a stock level scenario
-PRODUCT_TYPES = [
+PRODUCT_TYPES = (
     "canned_beans",
     "canned_tomatoes",
     "soup",
@@ -47,7 +60,7 @@ PRODUCT_TYPES = [
     "yogurt",
     "oatmeal",
     "juice",
-]
+)
 NUM_DAYS = 25
 TYPICAL_DAILY_DEMAND = 4  # Used to keep last-day demand sane when overriding
 
@@ -72,6 +85,20 @@ PRODUCT_SCENARIOS = {
     "oatmeal": "plenty",
     "juice": "plenty",
 }
+# Scenario EOD range per product, aligned with PRODUCT_TYPES
+SCENARIO_LO, SCENARIO_HI = np.array([
+    SCENARIO_RANGES[PRODUCT_SCENARIOS.get(pt, "medium")] for pt in PRODUCT_TYPES
+]).T
+
+
+def _link_or_copy(src: Path, dest: Path) -> None:
+    """Hardlink the read-only demo asset into uploads; copy if linking isn't possible."""
+    dest.unlink(missing_ok=True)
+    try:
+        os.link(src, dest)
+    except (OSError, NotImplementedError):
+        # e.g. uploads on another filesystem; copyfile uses sendfile where available
+        shutil.copyfile(src, dest)
 
 
 def main():
@@ -82,152 +109,58 @@ def main():
         default="default",
         help="Store name to generate data for (default: default)",
     )
+    add_seed_arguments(parser)
     args = parser.parse_args()
     store_name = args.store.strip()
     if not store_name:
         print("Error: Store name cannot be empty")
         sys.exit(1)
+    seed = resolve_seed(args)
 
     # Ensure magic-shelf.png exists
     if not MAGIC_SHELF_PATH.exists():
         print(f"Error: Demo image not found at {MAGIC_SHELF_PATH}")
         sys.exit(1)
 
-    Base.metadata.create_all(bind=engine)
+    ensure_schema()
     uploads_dir = Path(__file__).resolve().parent.parent / "uploads"
     snap_dir = uploads_dir / "snapshots"
     snap_dir.mkdir(parents=True, exist_ok=True)
 
-    db = SessionLocal()
-    try:
-        # Ensure store exists
-        store = db.query(Store).filter(Store.name == store_name).first()
-        if not store:
-            db.add(Store(name=store_name))
-            db.commit()
-            print(f"Created store '{store_name}'")
-
-        # Clear existing snapshots for this store
-        snapshot_ids = [
-            s.id for s in db.query(Snapshot.id).filter(Snapshot.store_name == store_name).all()
-        ]
-        if snapshot_ids:
-            db.query(InventoryCount).filter(
-                InventoryCount.snapshot_id.in_(snapshot_ids)
-            ).delete(synchronize_session=False)
-            db.query(Snapshot).filter(Snapshot.store_name == store_name).delete(
-                synchronize_session=False
-            )
-            db.commit()
-            print(f"Cleared existing snapshots and inventory for '{store_name}'")
-
-        now = datetime.now(timezone.utc).replace(tzinfo=None)
-        base_date = now.replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=NUM_DAYS)
-
-        snapshots_created = 0
-        counts_created = 0
-        latest_snapshot_id = None
-        last_am_snapshot_id = None
-
-        # Vary data each run for different demo outcomes
-        random.seed(int(time.time()) % (2**32))
-
-        eod_stock = {pt: 40 + random.randint(0, 20) for pt in PRODUCT_TYPES}
-
-        for day in range(NUM_DAYS):
-            date = base_date + timedelta(days=day)
-            am_time = date.replace(hour=8, minute=0, second=0, microsecond=0)
-            eod_time = date.replace(hour=18, minute=0, second=0, microsecond=0)
-
-            # AM snapshot
-            am_snap = Snapshot(
-                timestamp=am_time,
-                time_of_day="AM",
-                store_name=store_name,
-            )
-            db.add(am_snap)
-            db.flush()
-            last_am_snapshot_id = am_snap.id
-            snapshots_created += 1
-            for pt in PRODUCT_TYPES:
-                db.add(
-                    InventoryCount(
-                        snapshot_id=am_snap.id,
-                        product_type=pt,
-                        count=eod_stock[pt],
-                        confidence_score="high",
-                        units="units",
-                    )
-                )
-                counts_created += 1
-
-            demand = {
-                pt: max(0, int(4 + random.gauss(0, 1.5)))
-                for pt in PRODUCT_TYPES
-            }
-            for pt in PRODUCT_TYPES:
-                eod_stock[pt] = max(0, eod_stock[pt] - demand[pt])
-                if eod_stock[pt] < 5:
-                    eod_stock[pt] += 30 + random.randint(0, 15)
-
-            # EOD snapshot (this becomes the most recent when we process last day)
-            eod_snap = Snapshot(
-                timestamp=eod_time,
-                time_of_day="EOD",
-                store_name=store_name,
-            )
-            db.add(eod_snap)
-            db.flush()
-            latest_snapshot_id = eod_snap.id
-            snapshots_created += 1
-            for pt in PRODUCT_TYPES:
-                db.add(
-                    InventoryCount(
-                        snapshot_id=eod_snap.id,
-                        product_type=pt,
-                        count=eod_stock[pt],
-                        confidence_score="high",
-                        units="units",
-                    )
-                )
-                counts_created += 1
+    # Single transaction: the store is reset and reseeded together or not at all
+    with bulk_load_session() as db:
+        reset_store(db, store_name)
+        rngs = [product_rng(seed, pt) for pt in PRODUCT_TYPES]
+        counts = simulate_counts(rngs, NUM_DAYS)
 
         # Override last AM and EOD to demo different scenarios. Must set BOTH so
         # last-day demand (AM - EOD) stays sane (~4 units); current_inventory = EOD.
-        demo_eod = {}
-        for pt in PRODUCT_TYPES:
-            scenario = PRODUCT_SCENARIOS.get(pt, "medium")
-            lo, hi = SCENARIO_RANGES[scenario]
-            demo_eod[pt] = random.randint(lo, hi)
-        demo_am = {pt: count + TYPICAL_DAILY_DEMAND for pt, count in demo_eod.items()}
-
-        for snapshot_id in (last_am_snapshot_id, latest_snapshot_id):
-            counts_map = demo_am if snapshot_id == last_am_snapshot_id else demo_eod
-            for ic in db.query(InventoryCount).filter(
-                InventoryCount.snapshot_id == snapshot_id
-            ).all():
-                if ic.product_type in counts_map:
-                    ic.count = counts_map[ic.product_type]
-
-        db.commit()
-
-        # Set magic-shelf.png as the image for the most recent snapshot (snapshot feed)
-        if latest_snapshot_id:
-            dest = snap_dir / f"{latest_snapshot_id}.png"
-            shutil.copy2(MAGIC_SHELF_PATH, dest)
-            latest = db.query(Snapshot).filter(Snapshot.id == latest_snapshot_id).first()
-            if latest:
-                latest.image_path = f"snapshots/{latest_snapshot_id}.png"
-                db.commit()
-                print(f"Set snapshot feed image to magic-shelf.png (snapshot #{latest_snapshot_id})")
-
-        print(
-            f"Generated {snapshots_created} snapshots and {counts_created} inventory counts "
-            f"for store '{store_name}' ({NUM_DAYS} days × AM/EOD × {len(PRODUCT_TYPES)} products)."
+        demo_eod = np.array([
+            r.integers(lo, hi + 1) for r, lo, hi in zip(rngs, SCENARIO_LO, SCENARIO_HI)
+        ])
+        counts[-2] = demo_eod + TYPICAL_DAILY_DEMAND
+        counts[-1] = demo_eod
+
+        snapshot_ids, num_counts = insert_snapshots(db, store_name, PRODUCT_TYPES, counts)
+        latest_snapshot_id = snapshot_ids[-1]
+        refresh_daily_demand(db, store_name)
+
+    print(
+        f"Generated {len(snapshot_ids)} snapshots and {num_counts} inventory counts "
+        f"for store '{store_name}' ({NUM_DAYS} days × AM/EOD × {len(PRODUCT_TYPES)} products)."
+    )
+
+    # Set magic-shelf.png as the image for the most recent snapshot (snapshot feed).
+    # Separate transaction so a failed copy leaves the seeded data in place.
+    _link_or_copy(MAGIC_SHELF_PATH, snap_dir / f"{latest_snapshot_id}.png")
+    with SessionLocal.begin() as db:
+        db.execute(
+            update(Snapshot)
+            .where(Snapshot.id == latest_snapshot_id)
+            .values(image_path=f"snapshots/{latest_snapshot_id}.png")
         )
-        print("Inventory countdown and Suggested reorder tiles should now be functional.")
-    finally:
-        db.close()
+    print(f"Set snapshot feed image to magic-shelf.png (snapshot #{latest_snapshot_id})")
+    print("Inventory countdown and Suggested reorder tiles should now be functional.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,134 @@
+"""
+Shared pieces of the seed scripts (seed_forecast_data.py, demo_data.py): run seed,
+schema setup, store reset, stock simulation and the snapshot/count inserts.
+
+Import after the script has put the backend directory on sys.path.
+"""
+import argparse
+import hashlib
+import secrets
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy import delete, insert, inspect, select
+from sqlalchemy.orm import Session
+
+from database import engine, Base
+from models import Store, Snapshot, InventoryCount
+
+DEFAULT_SEED = 0xC0FFEE
+# Snapshot times relative to each day's midnight
+AM_OFFSET = timedelta(hours=8)
+EOD_OFFSET = timedelta(hours=18)
+
+
+def add_seed_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=DEFAULT_SEED,
+        help=f"Seed for the generated data (default: {DEFAULT_SEED:#x})",
+    )
+    parser.add_argument(
+        "--random",
+        action="store_true",
+        help="Use a fresh random seed instead of --seed (printed so the run can be reproduced)",
+    )
+
+
+def resolve_seed(args: argparse.Namespace) -> int:
+    """The run's seed from --seed/--random, printed so the run can be repeated."""
+    seed = secrets.randbits(32) if args.random else args.seed
+    print(f"Using seed {seed} (reproduce with --seed {seed})")
+    return seed
+
+
+def product_rng(seed: int, product_type: str) -> np.random.Generator:
+    """Independent, reproducible stream per product, derived from the run seed."""
+    digest = hashlib.sha256(f"{seed}:{product_type}".encode()).digest()
+    return np.random.default_rng(int.from_bytes(digest[:8], "big"))
+
+
+def ensure_schema() -> None:
+    """Create missing tables (works on a fresh DB without starting the server)."""
+    if set(Base.metadata.tables) - set(inspect(engine).get_table_names()):
+        Base.metadata.create_all(bind=engine)
+
+
+def reset_store(db: Session, store_name: str) -> None:
+    """Create the store if needed and delete its snapshots and inventory counts."""
+    if db.scalar(select(Store.id).where(Store.name == store_name)) is None:
+        db.execute(insert(Store.__table__).values(name=store_name))
+        print(f"Created store '{store_name}'")
+
+    store_snapshot_ids = select(Snapshot.id).where(Snapshot.store_name == store_name)
+    db.execute(delete(InventoryCount).where(InventoryCount.snapshot_id.in_(store_snapshot_ids)))
+    cleared = db.execute(delete(Snapshot).where(Snapshot.store_name == store_name)).rowcount
+    if cleared:
+        print(f"Cleared existing snapshots and inventory for '{store_name}'")
+
+
+def simulate_counts(rngs: list[np.random.Generator], num_days: int) -> np.ndarray:
+    """
+    Simulate stock per product (one generator each) over num_days of AM + EOD snapshots.
+
+    Each product starts at 40-60 units; AM equals the previous EOD, EOD = AM - demand
+    (min 0), restocked by 30-45 when it drops below 5. Returns counts with shape
+    (2 * num_days, len(rngs)): rows are day 0 AM, day 0 EOD, day 1 AM, ...
+    """
+    stock = np.array([40 + r.integers(0, 21) for r in rngs])
+    # Daily demand: 2-7 units per product with slight variation (truncated like int())
+    demand = np.column_stack([
+        np.clip(np.trunc(4 + r.normal(0, 1.5, num_days)), 0, None).astype(np.int64)
+        for r in rngs
+    ])
+    restock = np.column_stack([30 + r.integers(0, 16, num_days) for r in rngs])
+
+    # Restocks depend on the running level, so step the days; each step covers all products
+    counts = np.empty((2 * num_days, len(rngs)), dtype=np.int64)
+    for day in range(num_days):
+        counts[2 * day] = stock
+        stock = np.maximum(stock - demand[day], 0)
+        stock = np.where(stock < 5, stock + restock[day], stock)
+        counts[2 * day + 1] = stock
+    return counts
+
+
+def insert_snapshots(
+    db: Session,
+    store_name: str,
+    product_types: tuple[str, ...],
+    counts: np.ndarray,
+) -> tuple[list[int], int]:
+    """
+    Insert AM + EOD snapshots for the days ending yesterday (UTC), with counts from
+    simulate_counts (columns follow product_types). Returns (snapshot ids in row order,
+    number of inventory counts).
+    """
+    num_days = counts.shape[0] // 2
+    # Naive UTC midnight num_days ago (snapshot timestamps are stored as naive UTC)
+    today_utc = datetime.now(timezone.utc).date()
+    base_date = datetime.combine(today_utc, datetime.min.time()) - timedelta(days=num_days)
+    snap_rows = [
+        {"timestamp": base_date + timedelta(days=day) + offset, "time_of_day": tod, "store_name": store_name}
+        for day in range(num_days)
+        for tod, offset in (("AM", AM_OFFSET), ("EOD", EOD_OFFSET))
+    ]
+    # Multi-row inserts on the tables; RETURNING gives snapshot ids in row order
+    snapshot_ids = db.execute(
+        insert(Snapshot.__table__).returning(Snapshot.id, sort_by_parameter_order=True),
+        snap_rows,
+    ).scalars().all()
+    ic_rows = [
+        {
+            "snapshot_id": snapshot_id,
+            "product_type": pt,
+            "count": count,
+            "confidence_score": "high",
+            "units": "units",
+        }
+        for snapshot_id, snapshot_counts in zip(snapshot_ids, counts.tolist())
+        for pt, count in zip(product_types, snapshot_counts)
+    ]
+    db.execute(insert(InventoryCount.__table__), ic_rows)
+    return snapshot_ids, len(ic_rows)
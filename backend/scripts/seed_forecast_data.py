@@ -5,131 +5,52 @@ for testing the forecaster. Creates 25 days of AM + EOD snapshots with realistic
 daily demand so GET /forecast and the forecasts UI have data.
 
 Run from the backend directory:
-    python scripts/seed_forecast_data.py
+    python scripts/seed_forecast_data.py [--seed N | --random]
 """
-import random
+import argparse
 import sys
-from datetime import datetime, timedelta, timezone
 
 # Run from backend so imports work
 sys.path.insert(0, ".")
 
-from database import engine, SessionLocal, Base
-from models import Store, Snapshot, InventoryCount
-
-random.seed(42)
+from database import bulk_load_session
+from forecast import refresh_daily_demand
+from seed_common import (
+    add_seed_arguments,
+    ensure_schema,
+    insert_snapshots,
+    product_rng,
+    reset_store,
+    resolve_seed,
+    simulate_counts,
+)
 
 STORE_NAME = "default"
-PRODUCT_TYPES = ["canned_beans", "canned_tomatoes", "soup", "cereal"]
+PRODUCT_TYPES = ("canned_beans", "canned_tomatoes", "soup", "cereal")
 # Days of history (each day = 2 snapshots: AM + EOD)
 NUM_DAYS = 25
 # So we get 25 * 2 = 50 snapshots and 50 * 4 = 200 inventory count rows
 
 
 def main():
-    # Ensure all tables exist (works on fresh DB without needing to start the server)
-    Base.metadata.create_all(bind=engine)
-
-    db = SessionLocal()
-    try:
-        # Ensure the default store exists
-        if not db.query(Store).filter(Store.name == STORE_NAME).first():
-            db.add(Store(name=STORE_NAME))
-            db.commit()
-            print(f"Created store '{STORE_NAME}'")
-
-        # Clear existing snapshots and inventory counts for the default store
-        snapshot_ids = [
-            s.id for s in db.query(Snapshot.id).filter(Snapshot.store_name == STORE_NAME).all()
-        ]
-        if snapshot_ids:
-            db.query(InventoryCount).filter(
-                InventoryCount.snapshot_id.in_(snapshot_ids)
-            ).delete(synchronize_session=False)
-            db.query(Snapshot).filter(Snapshot.store_name == STORE_NAME).delete(
-                synchronize_session=False
-            )
-            db.commit()
-            print(f"Cleared existing snapshots and inventory for '{STORE_NAME}'")
-
-        now = datetime.now(timezone.utc).replace(tzinfo=None)
-        base_date = (now.replace(hour=0, minute=0, second=0, microsecond=0)
-                     - timedelta(days=NUM_DAYS))
-        snapshots_created = 0
-        counts_created = 0
-
-        # Per-product: simulate starting EOD stock, then each day AM (same as prev EOD or +restock), then EOD = AM - demand
-        eod_stock = {pt: 40 + random.randint(0, 20) for pt in PRODUCT_TYPES}
-
-        for day in range(NUM_DAYS):
-            date = base_date + timedelta(days=day)
-            am_time = date.replace(hour=8, minute=0, second=0, microsecond=0)
-            eod_time = date.replace(hour=18, minute=0, second=0, microsecond=0)
-
-            # AM snapshot: stock at start of day (same as previous EOD)
-            am_snap = Snapshot(
-                timestamp=am_time,
-                time_of_day="AM",
-                store_name=STORE_NAME,
-            )
-            db.add(am_snap)
-            db.flush()
-            snapshots_created += 1
-            for pt in PRODUCT_TYPES:
-                db.add(
-                    InventoryCount(
-                        snapshot_id=am_snap.id,
-                        product_type=pt,
-                        count=eod_stock[pt],
-                        confidence_score="high",
-                        units="units",
-                    )
-                )
-                counts_created += 1
-
-            # Daily demand: 2-7 units per product with slight variation
-            demand = {
-                pt: max(0, int(4 + random.gauss(0, 1.5)))
-                for pt in PRODUCT_TYPES
-            }
-            # EOD stock = AM - demand (min 0)
-            for pt in PRODUCT_TYPES:
-                eod_stock[pt] = max(0, eod_stock[pt] - demand[pt])
-                # Occasional "restock" so we don't go to zero forever
-                if eod_stock[pt] < 5:
-                    eod_stock[pt] += 30 + random.randint(0, 15)
-
-            # EOD snapshot
-            eod_snap = Snapshot(
-                timestamp=eod_time,
-                time_of_day="EOD",
-                store_name=STORE_NAME,
-            )
-            db.add(eod_snap)
-            db.flush()
-            snapshots_created += 1
-            for pt in PRODUCT_TYPES:
-                db.add(
-                    InventoryCount(
-                        snapshot_id=eod_snap.id,
-                        product_type=pt,
-                        count=eod_stock[pt],
-                        confidence_score="high",
-                        units="units",
-                    )
-                )
-                counts_created += 1
-
-        db.commit()
-        print(
-            f"Seeded {snapshots_created} snapshots and {counts_created} inventory counts "
-            f"({NUM_DAYS} days × AM/EOD × {len(PRODUCT_TYPES)} products)."
-        )
-        print(
-            f"Forecastable products: GET /forecast/products then GET /forecast?product_type=<name>"
-        )
-    finally:
-        db.close()
+    parser = argparse.ArgumentParser(description="Seed forecast test data for the default store")
+    add_seed_arguments(parser)
+    seed = resolve_seed(parser.parse_args())
+
+    ensure_schema()
+    with bulk_load_session() as db:
+        reset_store(db, STORE_NAME)
+        counts = simulate_counts([product_rng(seed, pt) for pt in PRODUCT_TYPES], NUM_DAYS)
+        snapshot_ids, num_counts = insert_snapshots(db, STORE_NAME, PRODUCT_TYPES, counts)
+        refresh_daily_demand(db, STORE_NAME)
+
+    print(
+        f"Seeded {len(snapshot_ids)} snapshots and {num_counts} inventory counts "
+        f"({NUM_DAYS} days × AM/EOD × {len(PRODUCT_TYPES)} products)."
+    )
+    print(
+        f"Forecastable products: GET /forecast/products then GET /forecast?product_type=<name>"
+    )
 
 
 if __name__ == "__main__":
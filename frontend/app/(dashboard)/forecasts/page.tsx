@@ -14,7 +14,7 @@ import { Badge } from "@/components/ui/badge";
 import { TrendingUp, Package, AlertTriangle, Loader2 } from "lucide-react";
 import {
   getForecastableProducts,
-  getForecast,
+  getForecasts,
   type ForecastResult,
   ApiError,
 } from "@/lib/api";
@@ -54,17 +54,7 @@ export default function ForecastsPage() {
         const { product_types } = await getForecastableProducts(storeName);
         if (cancelled) return;
         setProductTypes(product_types);
-        const horizon = 14;
-        const results: ForecastResult[] = [];
-        for (const pt of product_types) {
-          try {
-            const f = await getForecast(pt, { storeName, horizon });
-            if (cancelled) return;
-            results.push(f);
-          } catch {
-            // skip products that fail (e.g. race with DB)
-          }
-        }
+        const results = await getForecasts({ storeName, horizon: 14 });
         if (cancelled) return;
         setForecasts(results);
       } catch (e) {
@@ -12,8 +12,7 @@ import { cn } from "@/lib/utils";
 import { Loader2 } from "lucide-react";
 import {
   getSnapshots,
-  getForecastableProducts,
-  getForecast,
+  getForecasts,
   type Snapshot,
   type ForecastResult,
 } from "@/lib/api";
@@ -160,10 +159,7 @@ export default function DashboardPage() {
   useEffect(() => {
     let cancelled = false;
     setForecastLoading(true);
-    getForecastableProducts(storeName)
-      .then(({ product_types }) => Promise.all(
-        product_types.slice(0, 5).map((pt) => getForecast(pt, { storeName, horizon: 14 }))
-      ))
+    getForecasts({ storeName, horizon: 14, limit: 5 })
       .then((results) => {
         if (!cancelled) setForecasts(results);
       })
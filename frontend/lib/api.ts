@@ -49,6 +49,7 @@ export interface ForecastResult {
   restock_day_median?: number;
   restock_day_low?: number;
   restock_day_high?: number;
+  restock_interval?: "analytic" | "sampled" | null;
 }
 
 /**
@@ -184,6 +185,31 @@ export async function getForecast(
   return response.json();
 }
 
+/**
+ * Get forecasts for every forecastable product (or the first `limit`) in one request
+ */
+export async function getForecasts(
+  options?: { storeName?: string; horizon?: number; safetyStock?: number; limit?: number }
+): Promise<ForecastResult[]> {
+  const params = new URLSearchParams();
+  if (options?.storeName) params.set("store_name", options.storeName);
+  if (options?.horizon != null) params.set("horizon", String(options.horizon));
+  if (options?.safetyStock != null)
+    params.set("safety_stock", String(options.safetyStock));
+  if (options?.limit != null) params.set("limit", String(options.limit));
+  const response = await fetch(`${API_BASE_URL}/forecast/all?${params}`);
+  if (!response.ok) {
+    const errorData = await response.json().catch(() => ({}));
+    throw new ApiError(
+      errorData.detail || "Failed to fetch forecasts",
+      response.status,
+      errorData
+    );
+  }
+  const { forecasts } = await response.json();
+  return forecasts;
+}
+
 /**
  * Get the latest EOD snapshot for a store
  */